@@ -1,9 +1,11 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 import numpy as np
+import hashlib
+import inspect
 import math
+import os
+import traceback
 
 # Page config
 st.set_page_config(
@@ -13,7 +15,7 @@ st.set_page_config(
 )
 
 # Custom CSS for better styling
-st.markdown("""
+CUSTOM_CSS = """
     <style>
     .main {
         padding: 0rem 1rem;
@@ -33,20 +35,6 @@ st.markdown("""
     .stMetric [data-testid="stMetricValue"] {
         font-size: 16px !important;
     }
-    .stTabs [data-baseweb="tab-list"] {
-        gap: 24px;
-    }
-    .stTabs [data-baseweb="tab"] {
-        height: 50px;
-        padding-left: 20px;
-        padding-right: 20px;
-        background-color: #f0f2f6;
-        border-radius: 5px 5px 0 0;
-    }
-    .stTabs [data-baseweb="tab"][aria-selected="true"] {
-        background-color: #1f77b4;
-        color: white;
-    }
     h1 {
         color: #1f77b4;
         padding-bottom: 10px;
@@ -59,7 +47,8 @@ st.markdown("""
         width: 100%;
     }
     </style>
-    """, unsafe_allow_html=True)
+    """
+st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
 
 # Country code to full name mapping
 COUNTRY_NAMES = {
@@ -99,20 +88,44 @@ FLAG_EMOJI = {
     'TJK': '🇹🇯'
 }
 
+# Name/flag arrays in COUNTRY_NAMES order, indexed by categorical codes (the trailing None catches code -1)
+_COUNTRY_CODES = list(COUNTRY_NAMES)
+_NAMES_ARR = np.array([COUNTRY_NAMES[c] for c in _COUNTRY_CODES] + [None], dtype=object)
+_FLAGS_ARR = np.array([FLAG_EMOJI[c] for c in _COUNTRY_CODES] + [None], dtype=object)
+
+# Alphabetical order used by the flag bar
+_ALL_CODES = tuple(sorted(FLAG_EMOJI))
+
+# "🇺🇦 Ukraine"-style labels for the country selector
+_COUNTRY_LABELS = {code: f"{FLAG_EMOJI[code]} {name}" for code, name in COUNTRY_NAMES.items()}
+
+# Season columns of LeagueRanking.csv (oldest first) and their chart labels
+UEFA_COLS = ['UEFA_2018_19', 'UEFA_2019_20', 'UEFA_2020_21', 'UEFA_2021_22', 'UEFA_2022_23', 'UEFA_2023_24', 'UEFA_2024_25']
+AFC_COLS = ['AFC_2018', 'AFC_2019', 'AFC_2021', 'AFC_2022', 'AFC_2023_24', 'AFC_2024_25']
+FIFA_COLS = ['FIFA_2018_09_20', 'FIFA_2019_09_19', 'FIFA_2020_09_17', 'FIFA_2021_09_16', 'FIFA_2022_08_25', 'FIFA_2023_09_21', 'FIFA_2024_09_19', 'FIFA_2025_09_18']
+UEFA_LABELS = ['2018/19', '2019/20', '2020/21', '2021/22', '2022/23', '2023/24', '2024/25']
+AFC_LABELS = ['2018', '2019', '2021', '2022', '2023/24', '2024/25']
+
+# Weighted average of the last 5 seasons (oldest first), and the UEFA/AFC/FIFA split of the nation coefficient
+SEASON_WEIGHTS = np.array([0.6, 0.7, 0.8, 0.9, 1.0]) / 5
+NATION_WEIGHTS = np.array([0.3, 0.1, 0.6])
+
+FOOTER_HTML = """<div style='text-align: center; color: #666; padding: 20px;'><p><strong>Ex-Soviet Football Ranking System</strong></p><p>Data sources: UEFA, AFC, FIFA • Last updated: 2024/25 Season</p></div>"""
+
 # --- HELPER FUNCTIONS ---
 
-def get_league_tier_name(position):
-    """Returns the league name based on overall position."""
-    if position <= 20:
-        return "🥇 Premier League"
-    elif position <= 44:
-        return "🥈 Championship"
-    elif position <= 68:
-        return "🥉 League One"
-    elif position <= 92:
-        return "📋 League Two"
-    else:
-        return "⬇️ Below League Two"
+# Last overall position of each league tier, and the tier names (one more: everything below League Two)
+LEAGUE_TIER_BOUNDS = np.array([20, 44, 68, 92])
+LEAGUE_TIER_NAMES = np.array(["🥇 Premier League", "🥈 Championship", "🥉 League One", "📋 League Two", "⬇️ Below League Two"], dtype=object)
+
+def get_league_tier_names(positions):
+    """Returns the league name for each overall position (vectorized over an array of positions)."""
+    return LEAGUE_TIER_NAMES[np.searchsorted(LEAGUE_TIER_BOUNDS, positions, side='left')]
+
+def league_tier_slice(club_results_df, tier):
+    """Ranked clubs of one league tier (1 = Premier League) as a read-only positional slice."""
+    start = LEAGUE_TIER_BOUNDS[tier - 2] if tier > 1 else 0
+    return club_results_df.iloc[start:LEAGUE_TIER_BOUNDS[tier - 1]]
 
 def calculate_zoom(lat_min, lat_max, lon_min, lon_max):
     """Calculates optimal zoom level for mapbox."""
@@ -132,19 +145,23 @@ def calculate_zoom(lat_min, lat_max, lon_min, lon_max):
     zoom = max(min(min(zoom_lon, zoom_lat), 10), 1.0)
     return zoom
 
+def calculate_map_view(lat, lon):
+    """Returns (center_lat, center_lon, zoom) framing the given coordinate arrays."""
+    lat_min, lat_max = lat.min(), lat.max()
+    lon_min, lon_max = lon.min(), lon.max()
+    return (lat_min + lat_max) / 2, (lon_min + lon_max) / 2, calculate_zoom(lat_min, lat_max, lon_min, lon_max)
+
 def apply_jitter(df, lat_col='lat', lon_col='lon', threshold=0.0005, radius=0.00009):
     """
     Identifies points closer than 'threshold' degrees (~50m) and jitters them
     in a circle of 'radius' degrees (~10m).
     """
-    df = df.copy()
     if df.empty:
-        return df
+        return df.copy()
 
-    # Arrays for faster access
-    lats = df[lat_col].values
-    lons = df[lon_col].values
-    ids = df.index.values
+    # Jitter into copies of the two columns, attached with one assign() instead of per-cell .at writes
+    lats = df[lat_col].to_numpy(dtype=np.float64, copy=True)
+    lons = df[lon_col].to_numpy(dtype=np.float64, copy=True)
     
     # To keep track of processed points
     assigned = np.zeros(len(df), dtype=bool)
@@ -188,149 +205,158 @@ def apply_jitter(df, lat_col='lat', lon_col='lon', threshold=0.0005, radius=0.00
                 
                 # Calculate offsets
                 # Lat offset: just radius * cos(angle)
-                df.at[ids[member_idx], lat_col] = center_lat + radius * np.cos(angle)
+                lats[member_idx] = center_lat + radius * np.cos(angle)
                 
                 # Lon offset: radius * sin(angle) / cos(lat) to account for earth curvature
-                df.at[ids[member_idx], lon_col] = center_lon + (radius * np.sin(angle)) / np.cos(np.radians(center_lat))
+                lons[member_idx] = center_lon + (radius * np.sin(angle)) / np.cos(np.radians(center_lat))
     
-    return df
+    return df.assign(**{lat_col: lats, lon_col: lons})
 
+@st.cache_data
 def generate_flag_bar(present_country_codes):
-    all_codes = sorted(list(FLAG_EMOJI.keys()))
-    html = "<div style='display: flex; flex-wrap: wrap; gap: 4px; margin-bottom: 10px;'>"
-    for code in all_codes:
+    # present_country_codes is a frozenset so identical tiers hit the cache
+    parts = ["<div style='display: flex; flex-wrap: wrap; gap: 4px; margin-bottom: 10px;'>"]
+    for code in _ALL_CODES:
         flag = FLAG_EMOJI[code]
         if code in present_country_codes:
-            html += f"<span style='opacity: 1.0; font-size: 1.2rem; cursor: help;' title='{COUNTRY_NAMES[code]}'>{flag}</span>"
+            parts.append(f"<span style='opacity: 1.0; font-size: 1.2rem; cursor: help;' title='{COUNTRY_NAMES[code]}'>{flag}</span>")
         else:
-            html += f"<span style='opacity: 0.2; filter: grayscale(100%); font-size: 1.2rem; cursor: help;' title='Not represented: {COUNTRY_NAMES[code]}'>{flag}</span>"
-    html += "</div>"
-    return html
+            parts.append(f"<span style='opacity: 0.2; filter: grayscale(100%); font-size: 1.2rem; cursor: help;' title='Not represented: {COUNTRY_NAMES[code]}'>{flag}</span>")
+    parts.append("</div>")
+    return "".join(parts)
+
+@st.cache_data
+def generate_rankings_html(rows):
+    # rows: tuple of (flag, country_name, total4), already sorted by Nation Coefficient
+    parts = ["""<div style="display: flex; flex-direction: row; justify-content: space-between; overflow-x: auto; padding-bottom: 15px; gap: 10px;">"""]
+    for rank, (flag, country_name, total4) in enumerate(rows, 1):
+        rank_display = "🥇" if rank == 1 else "🥈" if rank == 2 else "🥉" if rank == 3 else f"#{rank}"
+        
+        parts.append(f"""
+        <div style="text-align: center; flex: 1; min-width: 60px;">
+            <div style="font-weight: bold; font-size: 1rem; margin-bottom: 5px;">{rank_display}</div>
+            <div style="font-size: 3rem; line-height: 1.1; margin-bottom: 5px; cursor: help;" title="{country_name}">{flag}</div>
+            <div style="font-size: 0.85rem; color: #555; background: #f0f2f6; border-radius: 5px; padding: 2px 5px;">{total4:.2f}</div>
+        </div>""")
+    parts.append("</div>")
+    return "".join(parts)
 
 # --- DATA LOADING ---
 
-@st.cache_data(ttl=0)
-def load_and_calculate_data():
-    # Load LeagueRanking.csv
-    league_df = pd.read_csv('LeagueRanking.csv', sep=',', decimal='.')
-    
-    # Convert numeric columns to float
-    uefa_cols = ['UEFA_2018_19', 'UEFA_2019_20', 'UEFA_2020_21', 'UEFA_2021_22', 'UEFA_2022_23', 'UEFA_2023_24', 'UEFA_2024_25']
-    afc_cols = ['AFC_2018', 'AFC_2019', 'AFC_2021', 'AFC_2022', 'AFC_2023_24', 'AFC_2024_25']
-    fifa_cols = ['FIFA_2018_09_20', 'FIFA_2019_09_19', 'FIFA_2020_09_17', 'FIFA_2021_09_16', 'FIFA_2022_08_25', 'FIFA_2023_09_21', 'FIFA_2024_09_19', 'FIFA_2025_09_18']
+# Fingerprint of the constants and helpers the loaders use, so editing them invalidates the disk cache
+DATA_VERSION = hashlib.sha1(repr((
+    COUNTRY_NAMES, FLAG_EMOJI, UEFA_COLS, AFC_COLS, FIFA_COLS, SEASON_WEIGHTS.tolist(), NATION_WEIGHTS.tolist(),
+    LEAGUE_TIER_BOUNDS.tolist(), LEAGUE_TIER_NAMES.tolist(), inspect.getsource(get_league_tier_names), inspect.getsource(apply_jitter)
+)).encode()).hexdigest()
+
+def read_csv_numeric(path, numeric_dtypes, dtype=None, **kwargs):
+    """read_csv with the numeric columns parsed straight to floats; stray non-numeric cells become NaN."""
+    try:
+        return pd.read_csv(path, dtype={**numeric_dtypes, **(dtype or {})}, **kwargs)
+    except ValueError:
+        # Typed parsing failed on a dirty cell: read those columns as text and coerce them like pd.to_numeric
+        df = pd.read_csv(path, dtype=dtype, **kwargs)
+        cols = [c for c in numeric_dtypes if c in df.columns]
+        df[cols] = df[cols].apply(pd.to_numeric, errors='coerce').astype({c: numeric_dtypes[c] for c in cols})
+        return df
+
+@st.cache_data(persist="disk", max_entries=1)
+def load_and_calculate_data(file_mtime, data_version):
+    # file_mtime and data_version are only part of the cache key
+    numeric_cols = UEFA_COLS + AFC_COLS + FIFA_COLS
     
-    for col in uefa_cols + afc_cols + fifa_cols:
-        league_df[col] = pd.to_numeric(league_df[col], errors='coerce').fillna(0)
+    # Load LeagueRanking.csv (only the columns we use), parsing the numeric columns straight to float
+    league_df = read_csv_numeric('LeagueRanking.csv', dict.fromkeys(numeric_cols, np.float64),
+                                 sep=',', decimal='.', usecols=['country_code'] + numeric_cols)
+    league_df[numeric_cols] = league_df[numeric_cols].fillna(0)
     
+    # Weighted average of the last 5 seasons as one matrix-vector product per competition
     # Calculate total_uefa
-    weights = [0.6, 0.7, 0.8, 0.9, 1.0]
-    uefa_last_5 = uefa_cols[-5:]
-    league_df['total'] = league_df.apply(lambda row: sum([row[uefa_last_5[i]] * weights[i] for i in range(len(uefa_last_5))]) / 5, axis=1)
+    league_df['total'] = league_df[UEFA_COLS[-5:]].to_numpy(dtype=np.float64) @ SEASON_WEIGHTS
     
     # Calculate total_afc
-    afc_last_5 = afc_cols[-5:]
-    league_df['total2'] = league_df.apply(lambda row: sum([row[afc_last_5[i]] * weights[i] for i in range(len(afc_last_5))]) / 5, axis=1)
+    league_df['total2'] = league_df[AFC_COLS[-5:]].to_numpy(dtype=np.float64) @ SEASON_WEIGHTS
     
     # Calculate total_fifa
-    fifa_last_5 = fifa_cols[-5:]
-    league_df['total3'] = league_df.apply(lambda row: sum([row[fifa_last_5[i]] * weights[i] for i in range(len(fifa_last_5))]) / 5, axis=1)
+    league_df['total3'] = league_df[FIFA_COLS[-5:]].to_numpy(dtype=np.float64) @ SEASON_WEIGHTS
     
     # Calculate total4 (Nation Coefficient)
-    league_df['total4'] = ((league_df['total'] * 0.3) + (league_df['total2'] * 0.1) + (league_df['total3'] * 0.6)) / 100
+    league_df['total4'] = (league_df[['total', 'total2', 'total3']].to_numpy() @ NATION_WEIGHTS) / 100
     
     # Add metadata
-    league_df['country_name'] = league_df['country_code'].map(COUNTRY_NAMES)
-    league_df['flag'] = league_df['country_code'].map(FLAG_EMOJI)
+    # Categorical over the fixed 15-country vocabulary: int codes plus one dictionary instead of 15 strings
+    league_df['country_name'] = pd.Categorical(league_df['country_code'], categories=_COUNTRY_CODES).rename_categories(list(COUNTRY_NAMES.values()))
+    league_df['flag'] = _FLAGS_ARR[league_df['country_name'].cat.codes.to_numpy()]
     
     # Sort
     league_df = league_df.sort_values('total4', ascending=False).reset_index(drop=True)
     
     return league_df
 
-@st.cache_data(ttl=0)
-def calculate_club_coefficients(league_df):
-    # Load ClubCoef.csv
-    club_df = pd.read_csv('ClubCoef.csv', sep=',', decimal='.')
-    
-    # Convert numeric columns
+@st.cache_data(persist="disk", max_entries=1)
+def calculate_club_coefficients(nation_coefs, club_mtime, data_version):
+    # nation_coefs: (country_code, total4) pairs, hashed so the club table follows any league recompute
     numeric_cols = ['year', 'league_tier', 'league_games', 'league_points', 'group', 'group_games', 'group_points']
-    for col in numeric_cols:
-        club_df[col] = pd.to_numeric(club_df[col], errors='coerce')
-    
-    if 'lat' in club_df.columns: club_df['lat'] = pd.to_numeric(club_df['lat'], errors='coerce')
-    if 'lon' in club_df.columns: club_df['lon'] = pd.to_numeric(club_df['lon'], errors='coerce')
-    
-    # Row Coefficient Calculation
-    def calculate_row_coefficient(row):
-        league_tier = row['league_tier']
-        league_games = row['league_games']
-        league_points = row['league_points']
-        group = row['group']
-        group_games = row['group_games']
-        group_points = row['group_points']
-        
-        has_group = pd.notna(group) and pd.notna(group_games) and pd.notna(group_points)
-        
-        if not has_group:
-            if league_games != 0 and league_tier != 0:
-                return (league_points / league_games) * (league_tier ** -0.95)
-            else:
-                return 0
-        else:
-            if group == 1 or group == 2:
-                league_part = 0
-                if league_games != 0 and league_tier != 0:
-                    league_part = (league_points / league_games) * (league_tier ** -0.95)
-                
-                group_part = 0
-                if group_games != 0 and league_tier != 0:
-                    multiplier = 1 if group == 1 else 0.913
-                    group_part = (group_points / group_games) * (league_tier ** -0.95) * multiplier
-                
-                return (league_part + group_part) / 2
-            else:
-                return 0
+    used_cols = {'country_code', 'team', 'team_code', 'lat', 'lon', *numeric_cols}
+    
+    # Load ClubCoef.csv (only the columns we use): float32 stats, float64 coordinates, categorical group keys
+    club_df = read_csv_numeric('ClubCoef.csv', {**dict.fromkeys(numeric_cols, np.float32), 'lat': np.float64, 'lon': np.float64},
+                               dtype={'country_code': 'category', 'team_code': 'category'},
+                               sep=',', decimal='.', usecols=lambda c: c in used_cols)
     
-    club_df['row_coefficient'] = club_df.apply(calculate_row_coefficient, axis=1)
+    # Row Coefficient Calculation (vectorized)
+    # One float64 conversion of the stats block, transposed to C order so each stat is a contiguous row
+    stats = np.ascontiguousarray(
+        club_df[['league_tier', 'league_games', 'league_points', 'group', 'group_games', 'group_points']].to_numpy(dtype=np.float64).T
+    )
+    league_tier, league_games, league_points, group, group_games, group_points = stats
+    
+    # Tier 0 or gameless rows always score 0, so the formula only runs on the rest (NaN rows stay active)
+    active = ((league_games != 0) | (group_games != 0)) & (league_tier != 0)
+    league_tier, league_games, league_points, group, group_games, group_points = stats[:, active]
+    
+    # league_tier != 0 is guaranteed by the active mask; zero game counts are masked out by np.where below
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tier_weight = league_tier ** -0.95
+        league_part = np.where(league_games != 0, (league_points / league_games) * tier_weight, 0.0)
+        multiplier = np.where(group == 1, 1.0, 0.913)
+        group_part = np.where(group_games != 0, (group_points / group_games) * tier_weight * multiplier, 0.0)
+    
+    # League split into championship (1) / relegation (2) group: average both parts; any other group value scores 0
+    has_group = ~(np.isnan(group) | np.isnan(group_games) | np.isnan(group_points))
+    valid_group = (group == 1) | (group == 2)
+    row_coefficient = np.zeros(len(club_df))
+    row_coefficient[active] = np.where(has_group, np.where(valid_group, (league_part + group_part) / 2, 0.0), league_part)
+    club_df['row_coefficient'] = row_coefficient
     if 'team' in club_df.columns: club_df['team'] = club_df['team'].astype(str).str.strip()
 
     # Aggregate by Club
-    club_results = []
+    keys = ['country_code', 'team_code']
     
-    for (country_code, team_code), group in club_df.groupby(['country_code', 'team_code']):
-        top_5 = group.nlargest(5, 'year')
-        
-        if len(top_5) > 0:
-            avg_coefficient = top_5['row_coefficient'].fillna(0).mean()
-            nation_coef_val = league_df[league_df['country_code'] == country_code]['total4'].values
-            nation_coef = nation_coef_val[0] if len(nation_coef_val) > 0 else 0
-            point_avg = avg_coefficient * nation_coef
-            
-            # Extract coordinates (first non-null)
-            lat = group['lat'].dropna().iloc[0] if not group['lat'].dropna().empty else None
-            lon = group['lon'].dropna().iloc[0] if not group['lon'].dropna().empty else None
-
-            club_results.append({
-                'country_code': country_code,
-                'team': group['team'].iloc[0],
-                'team_code': team_code,
-                'point_avg': point_avg,
-                'avg_coefficient': avg_coefficient,
-                'nation_coef': nation_coef,
-                'lat': lat,
-                'lon': lon
-            })
-    
-    club_results_df = pd.DataFrame(club_results)
-    club_results_df = club_results_df.sort_values('point_avg', ascending=False).reset_index(drop=True)
+    # 5 most recent seasons per club: one stable sort, then head(5) per group (same rows as nlargest(5, 'year'))
+    recent = club_df.sort_values('year', ascending=False, kind='stable').groupby(keys, observed=True).head(5)
+    
+    # Name and coordinates (first non-null) come from all seasons, the coefficient from the recent ones
+    club_results_df = club_df.groupby(keys, observed=True).agg(team=('team', 'first'), lat=('lat', 'first'), lon=('lon', 'first'))
+    # sort=False: the means are aligned to club_results_df by index, so their group order is irrelevant
+    club_results_df['avg_coefficient'] = recent['row_coefficient'].fillna(0).groupby([recent['country_code'], recent['team_code']], observed=True, sort=False).mean()
+    club_results_df = club_results_df.reset_index()
+    
+    # total4 looked up by code (0 if the country has no league entry); reversed so the top-ranked entry wins for duplicates
+    club_results_df['nation_coef'] = club_results_df['country_code'].astype(str).map(dict(reversed(nation_coefs))).fillna(0)
+    club_results_df['point_avg'] = club_results_df['avg_coefficient'] * club_results_df['nation_coef']
+    club_results_df = club_results_df[['country_code', 'team', 'team_code', 'point_avg', 'avg_coefficient', 'nation_coef', 'lat', 'lon']]
+    
+    club_results_df = club_results_df.sort_values('point_avg', ascending=False, kind='stable').reset_index(drop=True)
     
     # Add overall position and League Name
     club_results_df['overall_position'] = range(1, len(club_results_df) + 1)
-    club_results_df['league_tier_name'] = club_results_df['overall_position'].apply(get_league_tier_name)
+    club_results_df['league_tier_name'] = get_league_tier_names(club_results_df['overall_position'].to_numpy())
     
     # Add metadata
-    club_results_df['country_name'] = club_results_df['country_code'].map(COUNTRY_NAMES)
-    club_results_df['flag'] = club_results_df['country_code'].map(FLAG_EMOJI)
+    country_idx = pd.Categorical(club_results_df['country_code'], categories=_COUNTRY_CODES).codes
+    club_results_df['country_name'] = _NAMES_ARR[country_idx]
+    club_results_df['flag'] = _FLAGS_ARR[country_idx]
     
     # --- APPLY JITTER HERE ---
     # Apply jitter to coordinates for visualization purposes
@@ -340,398 +366,454 @@ def calculate_club_coefficients(league_df):
 
     return club_results_df, club_df
 
+@st.cache_resource
+def build_nation_table(_league_df, data_key):
+    # Column selection already returns a new frame, so no extra .copy() is needed
+    display_df = _league_df.loc[:, ['flag', 'country_name', 'total', 'total2', 'total3', 'total4']].rename(columns={
+        'flag': '🏴', 'country_name': 'Country', 'total': 'UEFA Coefficient',
+        'total2': 'AFC Coefficient', 'total3': 'FIFA Ranking', 'total4': 'Nation Coefficient'
+    })
+    display_df.insert(0, 'Rank', range(1, len(display_df) + 1))
+    # Arrow-backed dtypes let Streamlit ship the table to the browser without a per-cell conversion
+    return display_df.convert_dtypes(dtype_backend="pyarrow")
+
+@st.cache_resource
+def build_tier_table(_club_results_df, data_key, tier):
+    # Display table plus header stats (average coefficient, countries present) for one league tier
+    tier_df = league_tier_slice(_club_results_df, tier)
+    display = tier_df.loc[:, ['flag', 'team', 'point_avg']].rename(columns={'flag': '🏴', 'team': 'Club', 'point_avg': 'Coef'})
+    display.insert(0, 'Pos', np.arange(1, len(display) + 1))
+    
+    # Status: filled positionally in a plain array, then attached as one column
+    status = np.full(len(display), '', dtype=object)
+    if tier == 1:
+        if display.index[0] == 0: status[0] = '🏆 C'
+        status[-3:] = '🔻 R'
+    else:
+        status[0:2] = '🔼 P'
+        status[2:6] = '🎲 PO'
+        if tier < 4: status[-3:] = '🔻 R'
+    display['Status'] = status
+    return display, tier_df['point_avg'].mean(), frozenset(tier_df['country_code'].unique())
+
+@st.cache_resource
+def build_top_clubs_table(_club_results_df, data_key):
+    display_clubs = _club_results_df.head(20).loc[:, ['flag', 'team', 'country_name', 'point_avg']].rename(columns={
+        'flag': '🏴', 'team': 'Club', 'country_name': 'Country', 'point_avg': 'ClubCoef'
+    })
+    display_clubs.insert(0, 'Rank', range(1, len(display_clubs) + 1))
+    return display_clubs
+
+@st.cache_resource
+def group_clubs_by_country(_club_results_df, data_key):
+    # {code: clubs} in one groupby pass: ranking order within each group, sorted by country code
+    return {code: clubs for code, clubs in _club_results_df.groupby('country_code', observed=True, sort=True)}
+
+@st.cache_resource
+def build_country_data(_club_results_df, data_key, selected_country):
+    # Everything the country view derives from the selection, computed once per country
+    country_clubs = group_clubs_by_country(_club_results_df, data_key)[selected_country].copy()
+    country_clubs['national_rank'] = np.arange(1, len(country_clubs) + 1)
+    
+    display_country = country_clubs.loc[:, ['national_rank', 'team', 'league_tier_name', 'overall_position', 'point_avg']].rename(columns={
+        'national_rank': 'National Rank', 'team': 'Club', 'league_tier_name': 'League',
+        'overall_position': 'Overall Rank', 'point_avg': 'ClubCoef'
+    })
+    
+    # One binning pass feeds both the "in league system" metric and the league distribution chart
+    tier_counts = np.bincount(np.searchsorted(LEAGUE_TIER_BOUNDS, country_clubs['overall_position'].to_numpy(), side='left'), minlength=len(LEAGUE_TIER_NAMES))
+    return country_clubs, display_country, tier_counts
+
+# --- CHART BUILDERS ---
+# Cached on data_key so reruns reuse the figures; plotly is imported lazily inside the builders
+
+def clubs_with_coords(clubs):
+    """Returns (clubs, lat, lon) restricted to rows with coordinates, or (None, None, None) if there are none."""
+    lat = clubs['lat'].to_numpy(dtype=np.float64)
+    lon = clubs['lon'].to_numpy(dtype=np.float64)
+    has_coords = ~(np.isnan(lat) | np.isnan(lon))
+    if not has_coords.any():
+        return None, None, None
+    return clubs[has_coords], lat[has_coords], lon[has_coords]
+
+def club_hover_text(clubs, header=""):
+    """Hover labels as plain strings, so map figures carry no customdata columns."""
+    return ("<b>" + clubs['team'] + "</b><br><br>" + header + "🏆 " + clubs['league_tier_name']
+            + "<br>Coef: " + clubs['point_avg'].map("{:.4f}".format)).to_numpy()
+
+def make_club_map(lat, lon, hover, height, center, zoom, marker_size, opacity, margin):
+    """Shared single-trace club map used by the global, tier and country views."""
+    import plotly.graph_objects as go
+    return go.Figure(go.Scattermapbox(
+        lat=lat, lon=lon,
+        mode='markers', marker=dict(size=marker_size, color='#0068c9', opacity=opacity),
+        hovertext=hover, hoverinfo='text'
+    ), layout=go.Layout(
+        height=height,
+        mapbox_style="open-street-map",
+        margin={"r": margin, "t": margin, "l": margin, "b": margin},
+        mapbox=dict(center=dict(lat=center[0], lon=center[1]), zoom=zoom)
+    ))
+
+@st.cache_resource
+def build_nation_coef_fig(_league_df, data_key):
+    import plotly.graph_objects as go
+    # Plain go.Bar: a single 15-bar trace doesn't need plotly.express' dataframe introspection
+    fig = go.Figure(go.Bar(
+        x=_league_df['country_name'], y=_league_df['total4'],
+        text=_league_df['flag'], textposition='outside', textfont_size=20,
+        marker=dict(color=_league_df['total4'], colorscale='Oryel', colorbar=dict(title='Nation Coefficient')),
+        hovertemplate="Country=%{x}<br>Nation Coefficient=%{y}<extra></extra>"
+    ), layout=go.Layout(title='Nation Coefficients by Country', showlegend=False, height=500, xaxis_title='Country', yaxis_title='Nation Coefficient'))
+    return fig
+
+@st.cache_resource
+def build_breakdown_fig(_league_df, data_key):
+    import plotly.graph_objects as go
+    # Plain ndarrays skip plotly's Series -> list conversion for every trace
+    names = _league_df['country_name'].astype(str).to_numpy()
+    # Traces and layout go into the constructor in one pass instead of add_trace/update_layout round trips
+    fig = go.Figure([
+        go.Bar(name='UEFA (30%)', x=names, y=_league_df['total'].to_numpy(), marker_color='#1f77b4', text=_league_df['flag'].to_numpy(), textposition='outside'),
+        go.Bar(name='AFC (10%)', x=names, y=_league_df['total2'].to_numpy(), marker_color='#ff7f0e'),
+        go.Bar(name='FIFA (60%)', x=names, y=_league_df['total3'].to_numpy(), marker_color='#2ca02c')
+    ], layout=go.Layout(title='Coefficient Breakdown', barmode='group', height=500, xaxis_title='Country', yaxis_title='Points'))
+    return fig
+
+@st.cache_resource
+def build_uefa_history_fig(_league_df, data_key):
+    import plotly.graph_objects as go
+    # Dense (countries x seasons) matrix: each trace reads one contiguous row, no iterrows() or per-cell lookups
+    uefa_matrix = _league_df[UEFA_COLS].to_numpy(dtype=np.float64)
+    names = (_league_df['flag'] + " " + _league_df['country_name'].astype(str)).to_numpy()
+    fig = go.Figure([go.Scattergl(x=UEFA_LABELS, y=uefa_matrix[i], mode='lines+markers', name=name) for i, name in enumerate(names)],
+                    layout=go.Layout(title='UEFA Coefficients Over Time', height=600, hovermode='x unified'))
+    return fig
+
+@st.cache_resource
+def build_afc_history_fig(_league_df, data_key):
+    import plotly.graph_objects as go
+    afc_matrix = _league_df[AFC_COLS].to_numpy(dtype=np.float64)
+    names = (_league_df['flag'] + " " + _league_df['country_name'].astype(str)).to_numpy()
+    # UEFA-only nations have no AFC points at all; skip their flat zero lines
+    has_afc = afc_matrix.any(axis=1)
+    fig = go.Figure([go.Scattergl(x=AFC_LABELS, y=row, mode='lines+markers', name=name) for row, name in zip(afc_matrix[has_afc], names[has_afc])],
+                    layout=go.Layout(title='AFC Coefficients Over Time', height=600, hovermode='x unified'))
+    return fig
+
+@st.cache_resource
+def build_top_clubs_fig(_club_results_df, data_key):
+    import plotly.express as px
+    top_15 = _club_results_df.head(15)
+    fig = px.bar(
+        top_15, x='team', y='point_avg', title='Top 15 Clubs by ClubCoef',
+        labels={'point_avg': 'ClubCoef', 'team': 'Club'},
+        color='point_avg', color_continuous_scale='Oryel', text='flag', hover_data=['country_name']
+    )
+    fig.update_traces(textposition='outside', textfont_size=18)
+    fig.update_layout(showlegend=False, height=500, xaxis_tickangle=-45)
+    return fig
+
+@st.cache_resource
+def build_global_map_fig(_club_results_df, data_key):
+    """Scatter map of every club with coordinates, or None when there are none."""
+    clubs, lat, lon = clubs_with_coords(_club_results_df)
+    if clubs is None:
+        return None
+    header = clubs['flag'] + " " + clubs['country_name'] + "<br>"
+    return make_club_map(lat, lon, club_hover_text(clubs, header), height=600, center=(50, 60), zoom=2.5,
+                         marker_size=10, opacity=0.8, margin=0)
+
+@st.cache_resource
+def build_tier_map_fig(_club_results_df, data_key, tier):
+    """Map of one league tier, or None when none of its clubs have coordinates."""
+    # Wir filtern hier auf lat/lon. Da wir "Jittering" schon angewendet haben,
+    # sind die Koordinaten für überlappende Vereine bereits korrigiert.
+    clubs, lat, lon = clubs_with_coords(league_tier_slice(_club_results_df, tier))
+    if clubs is None:
+        return None
+    
+    # Zoom Berechnung mit der neuen Funktion (Faktor 2.0)
+    center_lat, center_lon, zoom_level = calculate_map_view(lat, lon)
+    return make_club_map(lat, lon, club_hover_text(clubs, clubs['flag'] + "<br>"), height=450,
+                         center=(center_lat, center_lon), zoom=zoom_level, marker_size=15, opacity=0.75, margin=5)
+
+@st.cache_resource
+def build_league_distribution_fig(_league_df, _club_results_df, data_key):
+    import plotly.express as px
+    # The first 92 ranked clubs are the league system; counts go onto a labelled copy of league_df
+    clubs_per_nation = _club_results_df['country_name'].iloc[:LEAGUE_TIER_BOUNDS[-1]].value_counts()
+    df_plot = _league_df.assign(
+        clubs_in_system=_league_df['country_name'].astype(str).map(clubs_per_nation).fillna(0),
+        x_label=_league_df['flag'] + " " + _league_df['country_name'].astype(str)
+    ).sort_values('clubs_in_system', ascending=False)
+    
+    fig_system = px.bar(
+        df_plot, x='x_label', y='clubs_in_system', labels={'clubs_in_system': 'Number of Clubs', 'x_label': 'Country'},
+        color='clubs_in_system', color_continuous_scale='Oryel', text='clubs_in_system'
+    )
+    fig_system.update_traces(textposition='outside')
+    fig_system.update_layout(xaxis_tickangle=-45, height=600, showlegend=False, margin=dict(t=50))
+    return fig_system
+
+@st.cache_resource
+def build_country_map_fig(_country_clubs, data_key, selected_country):
+    """Map of one country's clubs, or None when none of them have coordinates."""
+    clubs, lat, lon = clubs_with_coords(_country_clubs)
+    if clubs is None:
+        return None
+    
+    # Calc Zoom
+    center_lat, center_lon, zoom_level = calculate_map_view(lat, lon)
+    return make_club_map(lat, lon, club_hover_text(clubs), height=500,
+                         center=(center_lat, center_lon), zoom=zoom_level, marker_size=15, opacity=0.8, margin=0)
+
+@st.cache_resource
+def build_country_league_fig(_tier_counts, data_key, selected_country):
+    import plotly.express as px
+    # Already in tier order; keep only the leagues this country has clubs in
+    has_clubs = _tier_counts > 0
+    dist = pd.DataFrame({'League': LEAGUE_TIER_NAMES[has_clubs], 'Count': _tier_counts[has_clubs]})
+    fig = px.bar(dist, x='League', y='Count', title=f'League Distribution', color='Count', color_continuous_scale='Oryel')
+    fig.update_layout(showlegend=False, height=400)
+    return fig
+
+@st.cache_resource
+def build_country_top_clubs_fig(_country_clubs, data_key, selected_country):
+    import plotly.express as px
+    fig = px.bar(_country_clubs.head(10), x='team', y='point_avg', title=f'Top 10 Clubs', color='point_avg', color_continuous_scale='Oryel')
+    fig.update_layout(showlegend=False, height=400, xaxis_tickangle=-45)
+    return fig
+
 # --- MAIN APP ---
 
+# Only data loading is guarded: a broken CSV stops the page with a readable error
 try:
-    league_df = load_and_calculate_data()
-    club_results_df, club_df = calculate_club_coefficients(league_df)
-    
-    # HEADER
-    st.title("⚽ Ex-Soviet Republics Football Ranking System")
-    st.markdown("*Comprehensive ranking based on UEFA, AFC coefficients and FIFA rankings*")
+    league_mtime, club_mtime = os.path.getmtime('LeagueRanking.csv'), os.path.getmtime('ClubCoef.csv')
+    league_df = load_and_calculate_data(league_mtime, DATA_VERSION)
+    nation_coefs = tuple(league_df[['country_code', 'total4']].itertuples(index=False, name=None))
+    club_results_df, club_df = calculate_club_coefficients(nation_coefs, club_mtime, DATA_VERSION)
+except Exception as e:
+    st.error(f"❌ Error: {str(e)}")
+    st.code(traceback.format_exc())
+    st.stop()
+
+# Identifies the loaded frames: builders take them as unhashed _-prefixed arguments and are keyed on this
+data_key = (league_mtime, club_mtime, DATA_VERSION)
+
+# O(1) per-country lookups instead of boolean scans of league_df (it is sorted, so position = rank)
+nation_coef_map = dict(zip(league_df['country_code'], league_df['total4']))
+nation_rank_map = {code: rank for rank, code in enumerate(league_df['country_code'], 1)}
+
+# HEADER
+st.title("⚽ Ex-Soviet Republics Football Ranking System")
+st.markdown("*Comprehensive ranking based on UEFA, AFC coefficients and FIFA rankings*")
+st.markdown("---")
+
+# 1. NATION RANKINGS (SUMMARY)
+st.header("🏆 Current Nation Rankings (2024/25)")
+
+ranking_rows = tuple(zip(league_df['flag'], league_df['country_name'].astype(str), league_df['total4']))
+st.markdown(generate_rankings_html(ranking_rows), unsafe_allow_html=True)
+st.markdown("---")
+
+# 2. FULL NATION TABLE
+st.subheader("📊 Complete Nation Rankings")
+display_df = build_nation_table(league_df, data_key)
+
+# Format in the grid instead of stringifying, so the columns stay numeric and sortable
+coef_format = {col: st.column_config.NumberColumn(col, format="%.4f") for col in ['UEFA Coefficient', 'AFC Coefficient', 'FIFA Ranking', 'Nation Coefficient']}
+
+st.dataframe(
+    display_df, use_container_width=True, hide_index=True,
+    height=(len(display_df) + 1) * 35 + 3,
+    column_config={"Rank": st.column_config.NumberColumn("Rank", format="%d"), **coef_format}
+)
+st.markdown("---")
+
+# 3. TOP CLUBS
+st.header("🏅 Top Club Rankings (by ClubCoef)")
+
+st.subheader("⭐ Top 5 Clubs")
+cols = st.columns(5)
+# Pull the five rows out as plain tuples once instead of an .iloc row lookup per column
+top5 = club_results_df.head(5)
+top5_rows = zip(top5['flag'].tolist(), top5['team'].tolist(), top5['point_avg'].tolist(), top5['country_name'].tolist())
+for idx, (col, (flag, team, point_avg, country_name)) in enumerate(zip(cols, top5_rows)):
+    with col:
+        st.markdown(f"### {flag}")
+        st.markdown(f"**#{idx+1}**")
+        st.markdown(f"**{team}**")
+        st.metric("ClubCoef", f"{point_avg:.4f}")
+        st.caption(country_name)
+st.markdown("---")
+
+st.subheader("📋 Top 20 Clubs")
+display_clubs = build_top_clubs_table(club_results_df, data_key)
+st.dataframe(
+    display_clubs, use_container_width=True, hide_index=True,
+    column_config={
+        "Rank": st.column_config.NumberColumn("Rank", format="%d"),
+        "ClubCoef": st.column_config.NumberColumn("ClubCoef", format="%.4f")
+    }
+)
+st.markdown("---")
+
+# 4. VISUALIZATIONS
+st.header("📈 Visualizations")
+
+views = [
+    "🗺️ Global Map",
+    "Nation Coefficients", 
+    "Coefficient Breakdown", 
+    "Historical UEFA", 
+    "Historical AFC", 
+    "Top Clubs", 
+    "🏆 League System", 
+    "🌍 Country Rankings"
+]
+# Only the selected view gets built; st.tabs would execute every tab body on each rerun
+view = st.radio("View", views, horizontal=True, label_visibility="collapsed")
+
+# TAB: GLOBAL MAP
+if view == views[0]:
+    st.markdown("### 🗺️ Map of All Ex-Soviet Clubs")
+    st.markdown("Locations of all clubs in the database. Clubs sharing a stadium are slightly offset for visibility.")
+    
+    fig_global = build_global_map_fig(club_results_df, data_key)
+    
+    if fig_global is not None:
+        st.plotly_chart(fig_global, use_container_width=True)
+    else:
+        st.warning("No coordinate data available for clubs.")
+
+# TAB: NATION COEFFICIENTS
+elif view == views[1]:
+    st.plotly_chart(build_nation_coef_fig(league_df, data_key), use_container_width=True)
+
+# TAB: BREAKDOWN
+elif view == views[2]:
+    st.plotly_chart(build_breakdown_fig(league_df, data_key), use_container_width=True)
+
+# TAB: HISTORICAL UEFA
+elif view == views[3]:
+    st.plotly_chart(build_uefa_history_fig(league_df, data_key), use_container_width=True)
+    
+# TAB: HISTORICAL AFC
+elif view == views[4]:
+    st.plotly_chart(build_afc_history_fig(league_df, data_key), use_container_width=True)
+    st.caption("Countries without AFC points in any season are not shown.")
+
+# TAB: TOP CLUBS CHART
+elif view == views[5]:
+    st.plotly_chart(build_top_clubs_fig(club_results_df, data_key), use_container_width=True)
+
+# TAB: LEAGUE SYSTEM
+elif view == views[6]:
+    st.markdown("## 🏆 Theoretical Ex-Soviet League System")
+    st.markdown("*English football pyramid style - 4 divisions based on club coefficients*")
+    st.info("**System Overview:** The league system groups the top 92 clubs into 4 tiers.")
+    
+    # The tier builders slice the ranked clubs themselves, so they are cached on (data_key, tier)
+    tiers_data = [
+        ("🥇 Premier League", 1),
+        ("🥈 Championship", 2),
+        ("🥉 League One", 3),
+        ("📋 League Two", 4)
+    ]
+    
+    # 1. Tables
+    table_cols = st.columns(4)
+    for idx, (league_name, tier) in enumerate(tiers_data):
+        with table_cols[idx]:
+            display, avg_coef, present_codes = build_tier_table(club_results_df, data_key, tier)
+            
+            st.subheader(f"{league_name}")
+            st.markdown(generate_flag_bar(present_codes), unsafe_allow_html=True)
+            st.caption(f"Avg Coef: {avg_coef:.2f}")
+            
+            st.dataframe(
+                display, use_container_width=True, hide_index=True,
+                height=(len(display) + 1) * 35 + 5,
+                column_config={
+                    "Pos": st.column_config.NumberColumn("Pos", format="%d"),
+                    "Coef": st.column_config.NumberColumn("Coef", format="%.2f")
+                }
+            )
+
+    # 2. Maps
+    map_cols = st.columns(4)
+    for idx, (league_name, tier) in enumerate(tiers_data):
+        with map_cols[idx]:
+            fig_map = build_tier_map_fig(club_results_df, data_key, tier)
+            
+            if fig_map is not None:
+                st.markdown(f"###### 📍 {league_name} Map")
+                st.plotly_chart(fig_map, use_container_width=True)
+
+    # 3. Distribution Chart
     st.markdown("---")
+    st.subheader("📊 Distribution of Clubs in the League System")
+    st.plotly_chart(build_league_distribution_fig(league_df, club_results_df, data_key), use_container_width=True)
+
+# TAB: COUNTRY RANKINGS
+elif view == views[7]:
+    st.markdown("## 🌍 Club Rankings by Country")
+    col1, col2 = st.columns([1, 3])
+    countries_with_clubs = list(group_clubs_by_country(club_results_df, data_key))
     
-    # 1. NATION RANKINGS (SUMMARY)
-    st.header("🏆 Current Nation Rankings (2024/25)")
+    with col1:
+        selected_country = st.selectbox("Select Country:", countries_with_clubs, format_func=lambda x: _COUNTRY_LABELS.get(x, x))
+    with col2:
+        st.markdown(f"# {FLAG_EMOJI.get(selected_country, '')} {COUNTRY_NAMES.get(selected_country, '')}")
     
-    rankings_html = """<div style="display: flex; flex-direction: row; justify-content: space-between; overflow-x: auto; padding-bottom: 15px; gap: 10px;">"""
-    for idx, row in league_df.iterrows():
-        rank = idx + 1
-        rank_display = "🥇" if rank == 1 else "🥈" if rank == 2 else "🥉" if rank == 3 else f"#{rank}"
-            
-        rankings_html += f"""
-        <div style="text-align: center; flex: 1; min-width: 60px;">
-            <div style="font-weight: bold; font-size: 1rem; margin-bottom: 5px;">{rank_display}</div>
-            <div style="font-size: 3rem; line-height: 1.1; margin-bottom: 5px; cursor: help;" title="{row['country_name']}">{row['flag']}</div>
-            <div style="font-size: 0.85rem; color: #555; background: #f0f2f6; border-radius: 5px; padding: 2px 5px;">{row['total4']:.2f}</div>
-        </div>"""
-    rankings_html += "</div>"
-    st.markdown(rankings_html, unsafe_allow_html=True)
     st.markdown("---")
     
-    # 2. FULL NATION TABLE
-    st.subheader("📊 Complete Nation Rankings")
-    display_df = league_df[['flag', 'country_name', 'total', 'total2', 'total3', 'total4']].copy()
-    display_df.columns = ['🏴', 'Country', 'UEFA Coefficient', 'AFC Coefficient', 'FIFA Ranking', 'Nation Coefficient']
-    display_df.insert(0, 'Rank', range(1, len(display_df) + 1))
+    country_clubs, display_country, tier_counts = build_country_data(club_results_df, data_key, selected_country)
     
-    for col in ['UEFA Coefficient', 'AFC Coefficient', 'FIFA Ranking', 'Nation Coefficient']:
-        display_df[col] = display_df[col].apply(lambda x: f"{x:.4f}" if pd.notna(x) else "0.0000")
+    # New Country Map Section
+    st.subheader(f"🗺️ Map of Clubs in {COUNTRY_NAMES.get(selected_country)}")
     
-    st.dataframe(
-        display_df, use_container_width=True, hide_index=True,
-        height=(len(display_df) + 1) * 35 + 3,
-        column_config={"Rank": st.column_config.NumberColumn("Rank", format="%d")}
-    )
-    st.markdown("---")
+    fig_country_map = build_country_map_fig(country_clubs, data_key, selected_country)
     
-    # 3. TOP CLUBS
-    st.header("🏅 Top Club Rankings (by ClubCoef)")
-    top_clubs = club_results_df.head(20).copy()
-    
-    st.subheader("⭐ Top 5 Clubs")
-    cols = st.columns(5)
-    for idx in range(min(5, len(top_clubs))):
-        with cols[idx]:
-            club = top_clubs.iloc[idx]
-            st.markdown(f"### {club['flag']}")
-            st.markdown(f"**#{idx+1}**")
-            st.markdown(f"**{club['team']}**")
-            st.metric("ClubCoef", f"{club['point_avg']:.4f}")
-            st.caption(club['country_name'])
+    if fig_country_map is not None:
+        st.plotly_chart(fig_country_map, use_container_width=True)
+    else:
+        st.info("No GPS coordinates available for clubs in this country.")
+
     st.markdown("---")
     
-    st.subheader("📋 Top 20 Clubs")
-    display_clubs = top_clubs[['flag', 'team', 'country_name', 'point_avg']].copy()
-    display_clubs.columns = ['🏴', 'Club', 'Country', 'ClubCoef']
-    display_clubs.insert(0, 'Rank', range(1, len(display_clubs) + 1))
-    display_clubs['ClubCoef'] = display_clubs['ClubCoef'].apply(lambda x: f"{x:.4f}")
-    st.dataframe(display_clubs, use_container_width=True, hide_index=True)
-    st.markdown("---")
+    # Metrics & Tables
+    nation_coef = nation_coef_map.get(selected_country, 0)
+    clubs_in_system = int(tier_counts[:-1].sum())
     
-    # 4. VISUALIZATIONS
-    st.header("📈 Visualizations")
-    
-    tabs = st.tabs([
-        "🗺️ Global Map",
-        "Nation Coefficients", 
-        "Coefficient Breakdown", 
-        "Historical UEFA", 
-        "Historical AFC", 
-        "Top Clubs", 
-        "🏆 League System", 
-        "🌍 Country Rankings"
-    ])
-    
-    # TAB: GLOBAL MAP
-    with tabs[0]:
-        st.markdown("### 🗺️ Map of All Ex-Soviet Clubs")
-        st.markdown("Locations of all clubs in the database. Clubs sharing a stadium are slightly offset for visibility.")
-        
-        map_all_clubs = club_results_df.dropna(subset=['lat', 'lon']).copy()
-        
-        if not map_all_clubs.empty:
-            fig_global = px.scatter_mapbox(
-                map_all_clubs,
-                lat="lat", lon="lon",
-                hover_name="team",
-                hover_data={
-                    "flag": True, 
-                    "country_name": True,
-                    "league_tier_name": True,
-                    "point_avg": True,
-                    "lat": False, "lon": False
-                },
-                color_discrete_sequence=["#0068c9"],
-                zoom=2.5,
-                height=600
-            )
-            
-            fig_global.update_traces(
-                marker=dict(size=10, opacity=0.8),
-                hovertemplate=(
-                    "<b>%{hovertext}</b><br><br>"
-                    "%{customdata[0]} %{customdata[1]}<br>"
-                    "🏆 %{customdata[2]}<br>"
-                    "Coef: %{customdata[3]:.4f}<extra></extra>"
-                )
-            )
-            
-            fig_global.update_layout(
-                mapbox_style="open-street-map",
-                margin={"r":0,"t":0,"l":0,"b":0},
-                mapbox=dict(center=dict(lat=50, lon=60))
-            )
-            
-            st.plotly_chart(fig_global, use_container_width=True)
-        else:
-            st.warning("No coordinate data available for clubs.")
-
-    # TAB: NATION COEFFICIENTS
-    with tabs[1]:
-        fig = px.bar(
-            league_df, x='country_name', y='total4',
-            title='Nation Coefficients by Country',
-            labels={'total4': 'Nation Coefficient', 'country_name': 'Country'},
-            color='total4', color_continuous_scale='Oryel', text='flag'
-        )
-        fig.update_traces(textposition='outside', textfont_size=20)
-        fig.update_layout(showlegend=False, height=500)
-        st.plotly_chart(fig, use_container_width=True)
-    
-    # TAB: BREAKDOWN
-    with tabs[2]:
-        fig = go.Figure()
-        fig.add_trace(go.Bar(name='UEFA (30%)', x=league_df['country_name'], y=league_df['total'], marker_color='#1f77b4', text=league_df['flag'], textposition='outside'))
-        fig.add_trace(go.Bar(name='AFC (10%)', x=league_df['country_name'], y=league_df['total2'], marker_color='#ff7f0e'))
-        fig.add_trace(go.Bar(name='FIFA (60%)', x=league_df['country_name'], y=league_df['total3'], marker_color='#2ca02c'))
-        fig.update_layout(title='Coefficient Breakdown', barmode='group', height=500, xaxis_title='Country', yaxis_title='Points')
-        st.plotly_chart(fig, use_container_width=True)
-    
-    # TAB: HISTORICAL UEFA
-    with tabs[3]:
-        uefa_cols = ['UEFA_2018_19', 'UEFA_2019_20', 'UEFA_2020_21', 'UEFA_2021_22', 'UEFA_2022_23', 'UEFA_2023_24', 'UEFA_2024_25']
-        uefa_labels = ['2018/19', '2019/20', '2020/21', '2021/22', '2022/23', '2023/24', '2024/25']
-        fig = go.Figure()
-        for idx, row in league_df.iterrows():
-            fig.add_trace(go.Scatter(x=uefa_labels, y=[row[col] for col in uefa_cols], mode='lines+markers', name=f"{row['flag']} {row['country_name']}"))
-        fig.update_layout(title='UEFA Coefficients Over Time', height=600, hovermode='x unified')
-        st.plotly_chart(fig, use_container_width=True)
-        
-    # TAB: HISTORICAL AFC
-    with tabs[4]:
-        afc_cols = ['AFC_2018', 'AFC_2019', 'AFC_2021', 'AFC_2022', 'AFC_2023_24', 'AFC_2024_25']
-        afc_labels = ['2018', '2019', '2021', '2022', '2023/24', '2024/25']
-        fig = go.Figure()
-        for idx, row in league_df.iterrows():
-            fig.add_trace(go.Scatter(x=afc_labels, y=[row[col] for col in afc_cols], mode='lines+markers', name=f"{row['flag']} {row['country_name']}"))
-        fig.update_layout(title='AFC Coefficients Over Time', height=600, hovermode='x unified')
-        st.plotly_chart(fig, use_container_width=True)
-    
-    # TAB: TOP CLUBS CHART
-    with tabs[5]:
-        top_15 = club_results_df.head(15).copy()
-        fig = px.bar(
-            top_15, x='team', y='point_avg', title='Top 15 Clubs by ClubCoef',
-            labels={'point_avg': 'ClubCoef', 'team': 'Club'},
-            color='point_avg', color_continuous_scale='Oryel', text='flag', hover_data=['country_name']
-        )
-        fig.update_traces(textposition='outside', textfont_size=18)
-        fig.update_layout(showlegend=False, height=500, xaxis_tickangle=-45)
-        st.plotly_chart(fig, use_container_width=True)
-    
-    # TAB: LEAGUE SYSTEM
-    with tabs[6]:
-        st.markdown("## 🏆 Theoretical Ex-Soviet League System")
-        st.markdown("*English football pyramid style - 4 divisions based on club coefficients*")
-        st.info("**System Overview:** The league system groups the top 92 clubs into 4 tiers.")
-        
-        all_clubs = club_results_df.copy()
-        premier_league = all_clubs.iloc[0:20].copy()
-        championship = all_clubs.iloc[20:44].copy()
-        league_one = all_clubs.iloc[44:68].copy()
-        league_two = all_clubs.iloc[68:92].copy()
-        
-        tiers_data = [
-            (premier_league, "🥇 Premier League", 1),
-            (championship, "🥈 Championship", 2),
-            (league_one, "🥉 League One", 3),
-            (league_two, "📋 League Two", 4)
-        ]
-        
-        # 1. Tables
-        table_cols = st.columns(4)
-        for idx, (league_df_tier, league_name, tier) in enumerate(tiers_data):
-            with table_cols[idx]:
-                st.subheader(f"{league_name}")
-                st.markdown(generate_flag_bar(league_df_tier['country_code'].unique()), unsafe_allow_html=True)
-                st.caption(f"Avg Coef: {league_df_tier['point_avg'].mean():.2f}")
-                
-                display = league_df_tier[['flag', 'team', 'point_avg']].copy()
-                display.columns = ['🏴', 'Club', 'Coef']
-                display.insert(0, 'Pos', range(1, len(display) + 1))
-                display['Coef'] = display['Coef'].apply(lambda x: f"{x:.2f}")
-                
-                # Status
-                display['Status'] = ''
-                if tier == 1:
-                    if display.index[0] == 0: display.loc[0, 'Status'] = '🏆 C'
-                    display.loc[display.index[-3:], 'Status'] = '🔻 R'
-                else:
-                    display.loc[display.index[0:2], 'Status'] = '🔼 P'
-                    display.loc[display.index[2:6], 'Status'] = '🎲 PO'
-                    if tier < 4: display.loc[display.index[-3:], 'Status'] = '🔻 R'
-                
-                st.dataframe(
-                    display, use_container_width=True, hide_index=True,
-                    height=(len(display) + 1) * 35 + 5,
-                    column_config={"Pos": st.column_config.NumberColumn("Pos", format="%d")}
-                )
-    
-        # 2. Maps
-        map_cols = st.columns(4)
-        for idx, (league_df_tier, league_name, tier) in enumerate(tiers_data):
-            with map_cols[idx]:
-                # Wir filtern hier auf lat/lon. Da wir "Jittering" schon angewendet haben,
-                # sind die Koordinaten für überlappende Vereine bereits korrigiert.
-                map_data = league_df_tier.dropna(subset=['lat', 'lon'])
-                
-                if not map_data.empty:
-                    st.markdown(f"###### 📍 {league_name} Map")
-                    
-                    # Zoom Berechnung mit der neuen Funktion (Faktor 2.0)
-                    lat_min, lat_max = map_data['lat'].min(), map_data['lat'].max()
-                    lon_min, lon_max = map_data['lon'].min(), map_data['lon'].max()
-                    center_lat, center_lon = (lat_min + lat_max) / 2, (lon_min + lon_max) / 2
-                    
-                    # Hier wird die angepasste Funktion aufgerufen
-                    zoom_level = calculate_zoom(lat_min, lat_max, lon_min, lon_max)
-
-                    # Plot
-                    fig_map = px.scatter_mapbox(
-                        map_data, 
-                        lat="lat", lon="lon", 
-                        hover_name="team",
-                        # WICHTIG: Hier behalten wir die neuen Infos (League Name, Coef)
-                        hover_data={
-                            "flag": True, 
-                            "point_avg": True, 
-                            "league_tier_name": True, 
-                            "lat": False, "lon": False
-                        },
-                        height=450
-                    )
-                    
-                    fig_map.update_traces(
-                        marker=dict(size=15, color='#0068c9', opacity=0.75),
-                        # Das verbesserte Hover-Template
-                        hovertemplate="<b>%{hovertext}</b><br><br>%{customdata[0]}<br>🏆 %{customdata[2]}<br>Coef: %{customdata[1]:.4f}<extra></extra>"
-                    )
-                    
-                    fig_map.update_layout(
-                        mapbox_style="open-street-map", 
-                        margin={"r":5,"t":5,"l":5,"b":5},
-                        mapbox=dict(center=dict(lat=center_lat, lon=center_lon), zoom=zoom_level)
-                    )
-                    st.plotly_chart(fig_map, use_container_width=True)
-
-        # 3. Distribution Chart
-        st.markdown("---")
-        st.subheader("📊 Distribution of Clubs in the League System")
-        clubs_per_nation = all_clubs[all_clubs['overall_position'] <= 92]['country_name'].value_counts().reset_index()
-        clubs_per_nation.columns = ['country_name', 'clubs_in_system']
-        if 'clubs_in_system' in league_df.columns: league_df = league_df.drop(columns=['clubs_in_system'])
-        league_df = league_df.merge(clubs_per_nation, on='country_name', how='left').fillna({'clubs_in_system': 0})
-        df_plot = league_df.sort_values('clubs_in_system', ascending=False)
-        df_plot['x_label'] = df_plot['flag'] + " " + df_plot['country_name']
-        
-        fig_system = px.bar(
-            df_plot, x='x_label', y='clubs_in_system', labels={'clubs_in_system': 'Number of Clubs', 'x_label': 'Country'},
-            color='clubs_in_system', color_continuous_scale='Oryel', text='clubs_in_system'
-        )
-        fig_system.update_traces(textposition='outside')
-        fig_system.update_layout(xaxis_tickangle=-45, height=600, showlegend=False, margin=dict(t=50))
-        st.plotly_chart(fig_system, use_container_width=True)
-
-    # TAB: COUNTRY RANKINGS
-    with tabs[7]:
-        st.markdown("## 🌍 Club Rankings by Country")
-        col1, col2 = st.columns([1, 3])
-        countries_with_clubs = sorted(club_results_df['country_code'].unique())
-        
-        with col1:
-            selected_country = st.selectbox("Select Country:", countries_with_clubs, format_func=lambda x: f"{FLAG_EMOJI.get(x, '')} {COUNTRY_NAMES.get(x, x)}")
-        with col2:
-            st.markdown(f"# {FLAG_EMOJI.get(selected_country, '')} {COUNTRY_NAMES.get(selected_country, '')}")
-        
-        st.markdown("---")
-        
-        country_clubs = club_results_df[club_results_df['country_code'] == selected_country].copy()
-        country_clubs['national_rank'] = range(1, len(country_clubs) + 1)
-        
-        # New Country Map Section
-        st.subheader(f"🗺️ Map of Clubs in {COUNTRY_NAMES.get(selected_country)}")
-        
-        country_map_data = country_clubs.dropna(subset=['lat', 'lon'])
-        
-        if not country_map_data.empty:
-            # Calc Zoom
-            lat_min, lat_max = country_map_data['lat'].min(), country_map_data['lat'].max()
-            lon_min, lon_max = country_map_data['lon'].min(), country_map_data['lon'].max()
-            center_lat, center_lon = (lat_min + lat_max) / 2, (lon_min + lon_max) / 2
-            zoom_level = calculate_zoom(lat_min, lat_max, lon_min, lon_max)
-            
-            fig_country_map = px.scatter_mapbox(
-                country_map_data,
-                lat="lat", lon="lon",
-                hover_name="team",
-                hover_data={"flag": True, "league_tier_name": True, "point_avg": True, "lat": False, "lon": False},
-                color_discrete_sequence=["#0068c9"],
-                height=500
-            )
-            
-            fig_country_map.update_traces(
-                marker=dict(size=15, opacity=0.8),
-                hovertemplate="<b>%{hovertext}</b><br><br>🏆 %{customdata[1]}<br>Coef: %{customdata[2]:.4f}<extra></extra>"
-            )
-            
-            fig_country_map.update_layout(
-                mapbox_style="open-street-map",
-                margin={"r":0,"t":0,"l":0,"b":0},
-                mapbox=dict(center=dict(lat=center_lat, lon=center_lon), zoom=zoom_level)
-            )
-            st.plotly_chart(fig_country_map, use_container_width=True)
-        else:
-            st.info("No GPS coordinates available for clubs in this country.")
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Nation Rank", f"#{nation_rank_map.get(selected_country, 'N/A')}")
+    m2.metric("Nation Coefficient", f"{nation_coef:.4f}")
+    m3.metric("Total Clubs", len(country_clubs))
+    m4.metric("Clubs in League System", clubs_in_system)
+    
+    st.subheader(f"🏆 All Clubs from {COUNTRY_NAMES.get(selected_country)}")
+    
+    st.dataframe(
+        display_country, use_container_width=True, hide_index=True,
+        height=min(600, len(display_country) * 35 + 38),
+        column_config={
+            "National Rank": st.column_config.NumberColumn("National Rank", format="%d", width="small"),
+            "Overall Rank": st.column_config.NumberColumn("Overall Rank", format="%d", width="small"),
+            "ClubCoef": st.column_config.NumberColumn("ClubCoef", format="%.4f")
+        }
+    )
 
-        st.markdown("---")
-        
-        # Metrics & Tables
-        nation_coef = league_df[league_df['country_code'] == selected_country]['total4'].values[0] if len(league_df[league_df['country_code'] == selected_country]) > 0 else 0
-        clubs_in_system = len(country_clubs[country_clubs['overall_position'] <= 92])
-        
-        m1, m2, m3, m4 = st.columns(4)
-        m1.metric("Nation Rank", f"#{league_df[league_df['country_code'] == selected_country].index[0] + 1}")
-        m2.metric("Nation Coefficient", f"{nation_coef:.4f}")
-        m3.metric("Total Clubs", len(country_clubs))
-        m4.metric("Clubs in League System", clubs_in_system)
-        
-        st.subheader(f"🏆 All Clubs from {COUNTRY_NAMES.get(selected_country)}")
-        display_country = country_clubs[['national_rank', 'team', 'league_tier_name', 'overall_position', 'point_avg']].copy()
-        display_country.columns = ['National Rank', 'Club', 'League', 'Overall Rank', 'ClubCoef']
-        display_country['ClubCoef'] = display_country['ClubCoef'].apply(lambda x: f"{x:.4f}")
-        
-        st.dataframe(
-            display_country, use_container_width=True, hide_index=True,
-            height=min(600, len(display_country) * 35 + 38),
-            column_config={
-                "National Rank": st.column_config.NumberColumn("National Rank", format="%d", width="small"),
-                "Overall Rank": st.column_config.NumberColumn("Overall Rank", format="%d", width="small")
-            }
-        )
-
-        # Existing stats charts...
-        st.markdown("---")
-        c1, c2 = st.columns(2)
-        with c1:
-            dist = country_clubs['league_tier_name'].value_counts().reset_index()
-            dist.columns = ['League', 'Count']
-            order = ["🥇 Premier League", "🥈 Championship", "🥉 League One", "📋 League Two", "⬇️ Below League Two"]
-            dist['League'] = pd.Categorical(dist['League'], categories=order, ordered=True)
-            dist = dist.sort_values('League')
-            fig = px.bar(dist, x='League', y='Count', title=f'League Distribution', color='Count', color_continuous_scale='Oryel')
-            fig.update_layout(showlegend=False, height=400)
-            st.plotly_chart(fig, use_container_width=True)
-        with c2:
-            fig = px.bar(country_clubs.head(10), x='team', y='point_avg', title=f'Top 10 Clubs', color='point_avg', color_continuous_scale='Oryel')
-            fig.update_layout(showlegend=False, height=400, xaxis_tickangle=-45)
-            st.plotly_chart(fig, use_container_width=True)
-
-    # FOOTER
+    # Existing stats charts...
     st.markdown("---")
-    st.markdown("""<div style='text-align: center; color: #666; padding: 20px;'><p><strong>Ex-Soviet Football Ranking System</strong></p><p>Data sources: UEFA, AFC, FIFA • Last updated: 2024/25 Season</p></div>""", unsafe_allow_html=True)
+    c1, c2 = st.columns(2)
+    with c1:
+        st.plotly_chart(build_country_league_fig(tier_counts, data_key, selected_country), use_container_width=True)
+    with c2:
+        st.plotly_chart(build_country_top_clubs_fig(country_clubs, data_key, selected_country), use_container_width=True)
+
+# FOOTER
+st.markdown("---")
+st.markdown(FOOTER_HTML, unsafe_allow_html=True)
 
-except Exception as e:
-    st.error(f"❌ Error: {str(e)}")
-    import traceback
-    st.code(traceback.format_exc())